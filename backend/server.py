@@ -1,10 +1,14 @@
 from fastapi import FastAPI, HTTPException, Depends, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from pymongo import MongoClient
-from pydantic import BaseModel, Field
+from pymongo import MongoClient, ASCENDING, UpdateOne
+from pymongo.errors import BulkWriteError
+from pydantic import BaseModel, Field, field_validator, model_validator
 from datetime import datetime, timedelta
 from typing import List, Optional
+from calendar import monthrange
+import asyncio
+import logging
 import os
 from dotenv import load_dotenv
 import uuid
@@ -14,6 +18,8 @@ from bson import ObjectId
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
 app = FastAPI(title="Personal Finance Tracker", version="1.0.0")
 
 # CORS middleware
@@ -29,6 +35,13 @@ app.add_middleware(
 MONGO_URL = os.getenv("MONGO_URL", "mongodb://localhost:27017")
 DATABASE_NAME = os.getenv("DATABASE_NAME", "finance_tracker")
 
+# Recurring expense scheduler settings
+RECURRING_TICK_SECONDS = int(os.getenv("RECURRING_TICK_SECONDS", "60"))
+RECURRING_BATCH_SIZE = int(os.getenv("RECURRING_BATCH_SIZE", "500"))
+RECURRING_RULES_PER_TICK = int(os.getenv("RECURRING_RULES_PER_TICK", "200"))
+RECURRING_MAX_CATCHUP = int(os.getenv("RECURRING_MAX_CATCHUP", "1000"))
+RECURRING_PREVIEW_MAX_DAYS = 366
+
 client = MongoClient(MONGO_URL)
 db = client[DATABASE_NAME]
 
@@ -36,6 +49,7 @@ db = client[DATABASE_NAME]
 expenses_collection = db.expenses
 categories_collection = db.categories
 users_collection = db.users
+recurring_expenses_collection = db.recurring_expenses
 
 # Security
 security = HTTPBearer()
@@ -70,6 +84,50 @@ class SpendingSummary(BaseModel):
     expense_count: int
     top_categories: List[dict]
 
+class RecurringExpenseCreate(BaseModel):
+    amount: float = Field(..., gt=0, description="Amount must be positive")
+    category: str = Field(..., min_length=1, max_length=50)
+    description: Optional[str] = Field(None, max_length=200)
+    frequency: str = Field(..., pattern=r'^(daily|weekly|monthly|yearly)$')
+    interval: int = Field(1, ge=1, le=365, description="Repeat every N periods")
+    start_date: datetime = Field(default_factory=datetime.now)
+    end_date: Optional[datetime] = None
+
+    @field_validator("start_date", "end_date")
+    @classmethod
+    def to_naive_local(cls, value: Optional[datetime]) -> Optional[datetime]:
+        # Stored dates are naive local time, matching datetime.now() used by the scheduler
+        if value is not None and value.tzinfo is not None:
+            return value.astimezone().replace(tzinfo=None)
+        return value
+
+    @model_validator(mode="after")
+    def check_date_range(self):
+        if self.end_date and self.end_date < self.start_date:
+            raise ValueError("end_date must be after start_date")
+        return self
+
+class RecurringExpenseResponse(BaseModel):
+    id: str
+    amount: float
+    category: str
+    description: Optional[str]
+    frequency: str
+    interval: int
+    start_date: datetime
+    end_date: Optional[datetime]
+    next_due: Optional[datetime]
+    active: bool
+
+class RecurringPreview(BaseModel):
+    start_date: datetime
+    end_date: datetime
+    total_amount: float
+    occurrence_count: int
+    occurrences: List[dict]
+    overdue_amount: float
+    overdue_count: int
+
 # Utility functions
 def expense_to_dict(expense) -> dict:
     return {
@@ -88,6 +146,162 @@ def category_to_dict(category) -> dict:
         "icon": category.get("icon")
     }
 
+def recurring_to_dict(rule) -> dict:
+    return {
+        "id": str(rule["_id"]),
+        "amount": rule["amount"],
+        "category": rule["category"],
+        "description": rule.get("description"),
+        "frequency": rule["frequency"],
+        "interval": rule["interval"],
+        "start_date": rule["start_date"],
+        "end_date": rule.get("end_date"),
+        "next_due": rule.get("next_due"),
+        "active": rule["active"]
+    }
+
+def add_months(date: datetime, months: int) -> datetime:
+    # Clamp to the last day of the target month (Jan 31 -> Feb 28)
+    years, month_index = divmod(date.month - 1 + months, 12)
+    year = date.year + years
+    month = month_index + 1
+    day = min(date.day, monthrange(year, month)[1])
+    return date.replace(year=year, month=month, day=day)
+
+def recurring_date(rule, index: int) -> datetime:
+    """Return the date of the rule's index-th occurrence, ignoring end_date.
+
+    Occurrences are always computed from start_date so monthly rules anchored
+    on the 31st do not drift after passing through a short month.
+    """
+    step = index * rule["interval"]
+    start = rule["start_date"]
+    frequency = rule["frequency"]
+
+    if frequency == "daily":
+        return start + timedelta(days=step)
+    if frequency == "weekly":
+        return start + timedelta(weeks=step)
+    if frequency == "monthly":
+        return add_months(start, step)
+    return add_months(start, 12 * step)
+
+def recurring_index_at(rule, since: datetime) -> int:
+    """Return the first occurrence index dated at or after since, ignoring end_date."""
+    start = rule["start_date"]
+    if since <= start:
+        return 0
+
+    frequency = rule["frequency"]
+    if frequency in ("daily", "weekly"):
+        period_days = rule["interval"] * (7 if frequency == "weekly" else 1)
+        index = (since - start) // timedelta(days=period_days)
+    else:
+        period_months = rule["interval"] * (12 if frequency == "yearly" else 1)
+        months = (since.year - start.year) * 12 + since.month - start.month
+        index = max(0, months // period_months)
+
+    # The estimate is off by at most one period (month lengths, time of day)
+    while recurring_date(rule, index) < since:
+        index += 1
+    while index > 0 and recurring_date(rule, index - 1) >= since:
+        index -= 1
+    return index
+
+def recurring_occurrence(rule, index: int) -> Optional[datetime]:
+    """Return the date of the rule's index-th occurrence, or None past end_date."""
+    occurrence = recurring_date(rule, index)
+    end_date = rule.get("end_date")
+    if end_date and occurrence > end_date:
+        return None
+    return occurrence
+
+def recurring_occurrence_to_expense(rule, occurrence: datetime) -> dict:
+    # Deterministic id: re-materializing the same occurrence after a crash
+    # collides on _id instead of creating a duplicate expense
+    occurrence_id = uuid.uuid5(uuid.NAMESPACE_URL, f"{rule['_id']}:{occurrence.isoformat()}")
+    return {
+        "_id": str(occurrence_id),
+        "amount": rule["amount"],
+        "category": rule["category"],
+        "description": rule.get("description"),
+        "date": occurrence,
+        "recurring_id": rule["_id"],
+        "created_at": datetime.now()
+    }
+
+def insert_expense_batch(batch: List[dict]) -> int:
+    if not batch:
+        return 0
+    try:
+        result = expenses_collection.insert_many(batch, ordered=False)
+        return len(result.inserted_ids)
+    except BulkWriteError as e:
+        # Ignore duplicate keys from occurrences already written before a restart
+        if any(error["code"] != 11000 for error in e.details.get("writeErrors", [])):
+            raise
+        return e.details.get("nInserted", 0)
+
+def materialize_due_expenses(now: Optional[datetime] = None) -> dict:
+    """Insert expenses for every recurring occurrence due up to now.
+
+    Only rules whose next_due has passed are read, via the (active, next_due)
+    index. Missed occurrences after downtime are caught up, capped at
+    RECURRING_MAX_CATCHUP per rule per call. Expenses are written with batched
+    insert_many calls before the rules' next_due is advanced.
+    """
+    now = now or datetime.now()
+    due_rules = list(
+        recurring_expenses_collection.find({"active": True, "next_due": {"$lte": now}})
+        .sort("next_due", ASCENDING)
+        .limit(RECURRING_RULES_PER_TICK)
+    )
+
+    batch = []
+    rule_updates = []
+    created = 0
+
+    for rule in due_rules:
+        index = rule["next_index"]
+        occurrence = rule["next_due"]
+        caught_up = 0
+
+        while occurrence is not None and occurrence <= now and caught_up < RECURRING_MAX_CATCHUP:
+            batch.append(recurring_occurrence_to_expense(rule, occurrence))
+            if len(batch) >= RECURRING_BATCH_SIZE:
+                created += insert_expense_batch(batch)
+                batch = []
+            index += 1
+            caught_up += 1
+            occurrence = recurring_occurrence(rule, index)
+
+        rule_updates.append(UpdateOne(
+            {"_id": rule["_id"]},
+            {"$set": {
+                "next_index": index,
+                "next_due": occurrence,
+                "active": occurrence is not None
+            }}
+        ))
+
+    created += insert_expense_batch(batch)
+    if rule_updates:
+        recurring_expenses_collection.bulk_write(rule_updates, ordered=False)
+
+    return {"rules_processed": len(due_rules), "expenses_created": created}
+
+async def recurring_scheduler():
+    while True:
+        try:
+            # Keep draining while a full page of rules was due (catch-up after downtime)
+            while True:
+                result = await asyncio.to_thread(materialize_due_expenses)
+                if result["rules_processed"] < RECURRING_RULES_PER_TICK:
+                    break
+        except Exception:
+            logger.exception("Recurring expense scheduler tick failed")
+        await asyncio.sleep(RECURRING_TICK_SECONDS)
+
 # Initialize default categories
 @app.on_event("startup")
 async def startup_event():
@@ -104,6 +318,20 @@ async def startup_event():
         ]
         categories_collection.insert_many(default_categories)
 
+    # Next-due index so each scheduler tick only reads rules that are due
+    recurring_expenses_collection.create_index([("active", ASCENDING), ("next_due", ASCENDING)])
+    app.state.recurring_scheduler = asyncio.create_task(recurring_scheduler())
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    scheduler = getattr(app.state, "recurring_scheduler", None)
+    if scheduler:
+        scheduler.cancel()
+        try:
+            await scheduler
+        except asyncio.CancelledError:
+            pass
+
 # API Routes
 @app.get("/api/health")
 async def health_check():
@@ -332,6 +560,110 @@ async def delete_expense(expense_id: str):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/api/recurring-expenses", response_model=RecurringExpenseResponse)
+async def create_recurring_expense(rule: RecurringExpenseCreate):
+    try:
+        rule_data = {
+            "_id": str(uuid.uuid4()),
+            "amount": rule.amount,
+            "category": rule.category,
+            "description": rule.description,
+            "frequency": rule.frequency,
+            "interval": rule.interval,
+            "start_date": rule.start_date,
+            "end_date": rule.end_date,
+            "next_due": rule.start_date,
+            "next_index": 0,
+            "active": True,
+            "created_at": datetime.now()
+        }
+
+        result = recurring_expenses_collection.insert_one(rule_data)
+        if result.inserted_id:
+            return RecurringExpenseResponse(**recurring_to_dict(rule_data))
+        else:
+            raise HTTPException(status_code=500, detail="Failed to create recurring expense")
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/recurring-expenses", response_model=List[RecurringExpenseResponse])
+async def get_recurring_expenses():
+    try:
+        rules = list(recurring_expenses_collection.find({}).sort("next_due", ASCENDING))
+        return [RecurringExpenseResponse(**recurring_to_dict(rule)) for rule in rules]
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.get("/api/recurring-expenses/preview", response_model=RecurringPreview)
+async def preview_recurring_expenses(days: int = 30):
+    try:
+        if days < 1 or days > RECURRING_PREVIEW_MAX_DAYS:
+            raise HTTPException(
+                status_code=400,
+                detail=f"days must be between 1 and {RECURRING_PREVIEW_MAX_DAYS}"
+            )
+
+        now = datetime.now()
+        horizon = now + timedelta(days=days)
+
+        # Read-only projection. Past-due occurrences the scheduler has not written
+        # yet are only counted as overdue; the upcoming walk starts at now and is
+        # bounded by the horizon, however far behind a rule is.
+        occurrences = []
+        overdue_count = 0
+        overdue_amount = 0.0
+        rules = recurring_expenses_collection.find({"active": True, "next_due": {"$lte": horizon}})
+        for rule in rules:
+            index = max(rule["next_index"], recurring_index_at(rule, now))
+
+            overdue_end = index
+            if rule.get("end_date"):
+                overdue_end = min(index, recurring_index_at(rule, rule["end_date"] + timedelta(microseconds=1)))
+            rule_overdue = max(0, overdue_end - rule["next_index"])
+            overdue_count += rule_overdue
+            overdue_amount += rule_overdue * rule["amount"]
+
+            occurrence = recurring_occurrence(rule, index)
+            while occurrence is not None and occurrence <= horizon:
+                occurrences.append({
+                    "recurring_id": rule["_id"],
+                    "amount": rule["amount"],
+                    "category": rule["category"],
+                    "description": rule.get("description"),
+                    "date": occurrence
+                })
+                index += 1
+                occurrence = recurring_occurrence(rule, index)
+
+        occurrences.sort(key=lambda item: item["date"])
+        return RecurringPreview(
+            start_date=now,
+            end_date=horizon,
+            total_amount=sum(item["amount"] for item in occurrences),
+            occurrence_count=len(occurrences),
+            occurrences=occurrences,
+            overdue_amount=overdue_amount,
+            overdue_count=overdue_count
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+@app.delete("/api/recurring-expenses/{recurring_id}")
+async def delete_recurring_expense(recurring_id: str):
+    try:
+        result = recurring_expenses_collection.delete_one({"_id": recurring_id})
+        if result.deleted_count == 0:
+            raise HTTPException(status_code=404, detail="Recurring expense not found")
+        return {"message": "Recurring expense deleted successfully"}
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8001)
\ No newline at end of file
@@ -10,6 +10,8 @@ from datetime import datetime, timedelta
 import uuid
 import sys
 import os
+import asyncio
+import importlib
 
 # Get backend URL from frontend .env file
 def get_backend_url():
@@ -25,10 +27,22 @@ def get_backend_url():
 BASE_URL = get_backend_url()
 API_BASE = f"{BASE_URL}/api"
 
+# Scratch database for calling the recurring scheduler directly, without a live tick
+SCHEDULER_TEST_DATABASE = f"finance_tracker_test_{uuid.uuid4().hex[:8]}"
+
+def load_server():
+    """Import backend/server.py bound to the scratch database (startup hooks do not run)"""
+    os.environ["DATABASE_NAME"] = SCHEDULER_TEST_DATABASE
+    backend_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "backend")
+    if backend_dir not in sys.path:
+        sys.path.insert(0, backend_dir)
+    return importlib.import_module("server")
+
 class BackendTester:
     def __init__(self):
         self.test_results = []
         self.created_expense_ids = []
+        self.created_recurring_ids = []
         
     def log_test(self, test_name, success, message, response_data=None):
         """Log test results"""
@@ -267,6 +281,180 @@ class BackendTester:
         except requests.exceptions.RequestException as e:
             self.log_test("Delete Expense", False, f"Connection error: {str(e)}")
             
+    def test_recurring_expenses(self):
+        """Test creating a recurring expense rule and previewing upcoming spend"""
+        try:
+            rule_data = {
+                "amount": 1200.0,
+                "category": "Bills",
+                "description": "Monthly rent",
+                "frequency": "monthly",
+                "interval": 1,
+                "start_date": (datetime.now().replace(microsecond=0) + timedelta(days=5)).isoformat()
+            }
+            
+            response = requests.post(
+                f"{API_BASE}/recurring-expenses",
+                json=rule_data,
+                headers={"Content-Type": "application/json"},
+                timeout=10
+            )
+            
+            if response.status_code == 200:
+                rule = response.json()
+                self.created_recurring_ids.append(rule["id"])
+                if rule["next_due"] and rule["active"]:
+                    self.log_test("Create Recurring Expense", True, f"Recurring expense created with ID: {rule['id']}", rule)
+                else:
+                    self.log_test("Create Recurring Expense", False, f"Rule not scheduled: {rule}")
+            else:
+                self.log_test("Create Recurring Expense", False, f"HTTP {response.status_code}: {response.text}")
+                return
+                
+            # Horizon ends before the second monthly occurrence
+            response = requests.get(f"{API_BASE}/recurring-expenses/preview", params={"days": 20}, timeout=10)
+            
+            if response.status_code == 200:
+                preview = response.json()
+                projected = [item for item in preview["occurrences"] if item["recurring_id"] == rule["id"]]
+                projected_total = sum(item["amount"] for item in projected)
+                # start_date was sent without microseconds, which MongoDB would truncate
+                expected_date = datetime.fromisoformat(rule["start_date"])
+                if (len(projected) == 1 and
+                    projected[0]["amount"] == 1200.0 and
+                    datetime.fromisoformat(projected[0]["date"]) == expected_date and
+                    projected_total == 1200.0):
+                    self.log_test("Recurring Preview", True, f"Projected {preview['occurrence_count']} upcoming expenses", preview)
+                else:
+                    self.log_test("Recurring Preview", False, f"Unexpected projection: {preview}")
+            else:
+                self.log_test("Recurring Preview", False, f"HTTP {response.status_code}: {response.text}")
+                
+            # Invalid frequency should be rejected
+            response = requests.post(
+                f"{API_BASE}/recurring-expenses",
+                json={**rule_data, "frequency": "hourly"},
+                headers={"Content-Type": "application/json"},
+                timeout=10
+            )
+            if response.status_code in [400, 422]:
+                self.log_test("Invalid Recurring Frequency", True, f"Correctly rejected invalid frequency with status {response.status_code}")
+            else:
+                self.log_test("Invalid Recurring Frequency", False, f"Unexpected status code {response.status_code}: {response.text}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_test("Recurring Expenses", False, f"Connection error: {str(e)}")
+            
+    def test_recurring_materialization(self):
+        """Test catch-up, end_date deactivation and de-duplication of a scheduler tick"""
+        try:
+            server = load_server()
+            now = datetime(2030, 1, 10, 12, 0)
+            start_date = now - timedelta(days=3)
+            rule = asyncio.run(server.create_recurring_expense(server.RecurringExpenseCreate(
+                amount=9.99,
+                category="Bills",
+                description="Daily subscription",
+                frequency="daily",
+                start_date=start_date,
+                end_date=start_date + timedelta(days=2)
+            )))
+            
+            # Occurrences at start, start+1d and start+2d are all past due
+            result = server.materialize_due_expenses(now=now)
+            count = server.expenses_collection.count_documents({"recurring_id": rule.id})
+            if result["expenses_created"] == 3 and count == 3:
+                self.log_test("Recurring Catch-up", True, "Materialized 3 past-due occurrences", result)
+            else:
+                self.log_test("Recurring Catch-up", False, f"Expected 3 expenses, got {result} with {count} stored")
+                
+            stored = server.recurring_expenses_collection.find_one({"_id": rule.id})
+            if stored["next_due"] is None and stored["active"] is False and stored["next_index"] == 3:
+                self.log_test("Recurring End Date", True, "Rule deactivated after its last occurrence")
+            else:
+                self.log_test("Recurring End Date", False, f"Rule still scheduled after end_date: {stored}")
+                
+            # Simulate a crash between insert_many and advancing next_due
+            server.recurring_expenses_collection.update_one(
+                {"_id": rule.id},
+                {"$set": {"next_index": 0, "next_due": stored["start_date"], "active": True}}
+            )
+            result = server.materialize_due_expenses(now=now)
+            count = server.expenses_collection.count_documents({"recurring_id": rule.id})
+            if result["rules_processed"] == 1 and result["expenses_created"] == 0 and count == 3:
+                self.log_test("Recurring Materialized Once", True, "Re-running the tick did not duplicate expenses", result)
+            else:
+                self.log_test("Recurring Materialized Once", False, f"Expected no new expenses, got {result} with {count} stored")
+                
+        except Exception as e:
+            self.log_test("Recurring Catch-up", False, f"Scheduler error: {str(e)}")
+            
+    def test_recurring_preview_overdue(self):
+        """Test past-due occurrences are reported as overdue, clamped at end_date"""
+        try:
+            server = load_server()
+            server.recurring_expenses_collection.delete_many({})
+            start_date = datetime.now() - timedelta(days=5) + timedelta(hours=1)
+            
+            # 5 overdue occurrences (start .. start+4d), then daily from start+5d = now+1h
+            open_rule = asyncio.run(server.create_recurring_expense(server.RecurringExpenseCreate(
+                amount=10.0,
+                category="Bills",
+                frequency="daily",
+                start_date=start_date
+            )))
+            # end_date limits it to 3 overdue occurrences and nothing upcoming
+            ended_rule = asyncio.run(server.create_recurring_expense(server.RecurringExpenseCreate(
+                amount=1.0,
+                category="Bills",
+                frequency="daily",
+                start_date=start_date,
+                end_date=start_date + timedelta(days=2)
+            )))
+            
+            preview = asyncio.run(server.preview_recurring_expenses(days=30))
+            open_upcoming = [item for item in preview.occurrences if item["recurring_id"] == open_rule.id]
+            ended_upcoming = [item for item in preview.occurrences if item["recurring_id"] == ended_rule.id]
+            if (preview.overdue_count == 8 and
+                preview.overdue_amount == 53.0 and
+                len(open_upcoming) == 30 and
+                not ended_upcoming and
+                all(item["date"] >= preview.start_date for item in preview.occurrences)):
+                self.log_test("Recurring Preview Overdue", True, "Overdue occurrences reported separately from upcoming spend")
+            else:
+                self.log_test("Recurring Preview Overdue", False,
+                              f"Got overdue {preview.overdue_count}/{preview.overdue_amount}, "
+                              f"upcoming {len(open_upcoming)}/{len(ended_upcoming)}")
+                
+        except Exception as e:
+            self.log_test("Recurring Preview Overdue", False, f"Scheduler error: {str(e)}")
+            
+    def test_recurring_date_range(self):
+        """Test mixed timezone-aware and naive dates are validated, not a server error"""
+        try:
+            rule_data = {
+                "amount": 15.0,
+                "category": "Bills",
+                "frequency": "monthly",
+                "start_date": "2030-01-10T00:00:00+00:00",
+                "end_date": "2030-01-01T00:00:00"
+            }
+            response = requests.post(
+                f"{API_BASE}/recurring-expenses",
+                json=rule_data,
+                headers={"Content-Type": "application/json"},
+                timeout=10
+            )
+            if response.status_code == 422:
+                self.log_test("Invalid Recurring Date Range", True, "Correctly rejected end_date before start_date")
+            else:
+                if response.status_code == 200:
+                    self.created_recurring_ids.append(response.json()["id"])
+                self.log_test("Invalid Recurring Date Range", False, f"Expected 422, got {response.status_code}: {response.text}")
+                
+        except requests.exceptions.RequestException as e:
+            self.log_test("Invalid Recurring Date Range", False, f"Connection error: {str(e)}")
+            
     def cleanup(self):
         """Clean up any remaining test expenses"""
         for expense_id in self.created_expense_ids:
@@ -274,6 +462,16 @@ class BackendTester:
                 requests.delete(f"{API_BASE}/expenses/{expense_id}", timeout=5)
             except:
                 pass
+        for recurring_id in self.created_recurring_ids:
+            try:
+                requests.delete(f"{API_BASE}/recurring-expenses/{recurring_id}", timeout=5)
+            except:
+                pass
+        if "server" in sys.modules:
+            try:
+                sys.modules["server"].client.drop_database(SCHEDULER_TEST_DATABASE)
+            except:
+                pass
                 
     def run_all_tests(self):
         """Run all backend tests"""
@@ -289,6 +487,10 @@ class BackendTester:
         self.test_summary_endpoints()
         self.test_invalid_expense_data()
         self.test_delete_expense()
+        self.test_recurring_expenses()
+        self.test_recurring_materialization()
+        self.test_recurring_preview_overdue()
+        self.test_recurring_date_range()
         
         # Cleanup
         self.cleanup()